@@ -3,4 +3,4 @@
 
 from .middleware import ProfilerMiddleware
 # Import profiler_instance from profiler_data to avoid circular dependency
-from .profiler_data import profiler_instance
+from .profiler_data import ProfileRow, profiler_instance
@@ -1,102 +1,172 @@
 # fastapi_simple_profiler/middleware.py
+#
+# Hot-path rule: the per-request work of this middleware is bound by allocations
+# and bytes moved, not by computation. Keep it that way:
+#   - no JSON parse per request
+#   - no DataFrame per request
+#   - no list slice per request
+#   - no URL/Request object per request
+#   - no stdout writes per request (debug output goes through logger.debug, and
+#     never inside the timed region)
+# Anything heavier (export, rendering, analysis) belongs at read time in
+# profiler_data.py, never in __call__ or add_profile_data.
+import logging
 import time
 import os
-import json
-from typing import Callable, Awaitable
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.types import ASGIApp
-
-try:
-    from pyinstrument import Profiler
-except ImportError:
-    print("Warning: pyinstrument not found. CPUTimeMs will not be available.")
-    Profiler = None
-
-from .profiler_data import profiler_instance
-
-class ProfilerMiddleware(BaseHTTPMiddleware):
+from typing import Dict
+from urllib.parse import parse_qsl
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .profiler_data import ProfileRow, profiler_instance
+
+logger = logging.getLogger(__name__)
+
+# [epoch second, formatted timestamp] of the last formatted Timestamp value
+_ts_cache = [0, ""]
+
+
+def _now_ts() -> str:
+    """
+    Returns the current local time as "YYYY-MM-DD HH:MM:SS".
+    The timestamp only changes once per second, so the formatted string is
+    cached and strftime/localtime run at most once per second.
+    """
+    now = int(time.time())
+    cache = _ts_cache
+    if cache[0] != now:
+        # A single list assignment keeps the second and its string consistent across threads
+        cache[:] = [now, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))]
+    return cache[1]
+
+
+# Canonical method and path strings, so retained rows for repeated endpoints share a
+# single string object. Bounded, since both values are supplied by the client.
+_INTERN_LIMIT = 4096
+_method_intern: Dict[str, str] = {}
+_path_intern: Dict[str, str] = {}
+
+
+def _intern(table: Dict[str, str], value: str) -> str:
+    """
+    Returns the canonical copy of value from table, adding it if there is room.
+    """
+    interned = table.get(value)
+    if interned is None:
+        if len(table) >= _INTERN_LIMIT:
+            return value
+        interned = table.setdefault(value, value)
+    return interned
+
+
+def _get_query_param(query_string: bytes, name: str) -> str:
     """
-    Middleware to profile FastAPI requests and store performance metrics.
+    Returns the value of a query parameter from the raw ASGI query string.
+    Mirrors Starlette's QueryParams.get(), where the last occurrence wins.
+    """
+    value = ""
+    for key, param_value in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True):
+        if key == name:
+            value = param_value
+    return value
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware to profile FastAPI requests and store performance metrics.
     """
 
     def __init__(self, app: ASGIApp,
                  enable_by_default: bool = False,
                  profile_query_param: str = "profile",
-                 max_retained_requests: int = 1000):
-        super().__init__(app)
+                 max_retained_requests: int = 1000,
+                 detailed_cpu_profiling: bool = False):
+        self.app = app
         self.enable_by_default = enable_by_default
         self.profile_query_param = profile_query_param
+        # The environment cannot change mid-process in any realistic deployment, so
+        # read it once here instead of on every request.
+        self._enabled_by_env = os.getenv("FASTAPI_SIMPLE_PROFILER_ENABLED", "").lower() == "true"
+        self._profile_query_param_bytes = profile_query_param.encode()
+        # enable_by_default and the env var are fixed for the middleware's lifetime, so
+        # the profiling decision is reduced here to a check on the query parameter value.
+        if enable_by_default:
+            self._should_profile = lambda query_param_value: query_param_value != "false"
+        elif self._enabled_by_env:
+            self._should_profile = lambda query_param_value: True
+        else:
+            self._should_profile = lambda query_param_value: query_param_value == "true"
+        # pyinstrument is only imported when the detailed mode is requested, since
+        # sampling the stack of every profiled request is far more expensive than
+        # reading the process CPU clock.
+        self._profiler_cls = None
+        if detailed_cpu_profiling:
+            try:
+                from pyinstrument import Profiler
+                self._profiler_cls = Profiler
+            except ImportError:
+                print("Warning: pyinstrument not found. Falling back to time.process_time_ns() for CPUTimeMs.")
         profiler_instance.configure(max_retained_requests=max_retained_requests)
         # Added a print to confirm middleware initialization and its default setting
         print(f"INFO: ProfilerMiddleware initialized. enable_by_default={self.enable_by_default}")
 
-    async def dispatch(self, request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
-        Dispatches the request through the middleware, conditionally profiling it.
+        Passes the request through to the wrapped app, conditionally profiling it.
         """
-        is_enabled_by_env = os.getenv("FASTAPI_SIMPLE_PROFILER_ENABLED", "false").lower() == "true"
-        query_param_value = request.query_params.get(self.profile_query_param, "").lower()
-        is_enabled_by_query = query_param_value == "true"
-        is_disabled_by_query = query_param_value == "false"
-
-        # --- DEBUG PRINTS START ---
-        print(f"\nDEBUG: Processing Request to {request.url.path}")
-        print(f"DEBUG: Middleware setting: enable_by_default={self.enable_by_default}")
-        print(f"DEBUG: Environment variable 'FASTAPI_SIMPLE_PROFILER_ENABLED' is '{os.getenv('FASTAPI_SIMPLE_PROFILER_ENABLED')}'. Interpreted as is_enabled_by_env={is_enabled_by_env}")
-        print(f"DEBUG: Query parameter '{self.profile_query_param}' is '{query_param_value}'. Interpreted as is_enabled_by_query={is_enabled_by_query}, is_disabled_by_query={is_disabled_by_query}")
-        # --- DEBUG PRINTS END ---
-
-        # Determine if profiling should be active for this specific request
-        profile_active = (self.enable_by_default and not is_disabled_by_query) or \
-                         (not self.enable_by_default and (is_enabled_by_query or is_enabled_by_env))
-
-        # --- DEBUG PRINTS START ---
-        print(f"DEBUG: Final decision: profile_active={profile_active}")
-        # --- DEBUG PRINTS END ---
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        query_string = scope["query_string"]
+        # Only decode the query string when the parameter name actually appears in it
+        query_param_value = ""
+        if self._profile_query_param_bytes in query_string:
+            query_param_value = _get_query_param(query_string, self.profile_query_param).lower()
+
+        # Non-profiled requests are a plain pass-through: no timers, no send wrapper
+        if not self._should_profile(query_param_value):
+            await self.app(scope, receive, send)
+            return
+
+        path = _intern(_path_intern, scope["path"])
+        method = _intern(_method_intern, scope["method"])
+
+        logger.debug("Profiling request to %s (enable_by_default=%s, is_enabled_by_env=%s, %s=%r)",
+                     path, self.enable_by_default, self._enabled_by_env,
+                     self.profile_query_param, query_param_value)
+
+        # Defaults to 500 so a request that fails before sending a response is recorded as an error
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
-        start_time = time.perf_counter()
         profiler = None
-        response = None
-        cpu_time_ms = 0.0
+        if self._profiler_cls:
+            profiler = self._profiler_cls()
 
-        if profile_active and Profiler:
-            print(f"DEBUG: Pyinstrument profiler STARTING for request to {request.url.path}.")
-            profiler = Profiler()
+        start_time = time.perf_counter()
+        cpu_start = time.process_time_ns()
+        if profiler:
             profiler.start()
 
         try:
-            response = await call_next(request)
-        except Exception as e:
-            if response is None:
-                response = Response("Internal Server Error", status_code=500)
-            raise e
+            await self.app(scope, receive, send_wrapper)
         finally:
             end_time = time.perf_counter()
             total_time_ms = (end_time - start_time) * 1000
+            cpu_time_ms = (time.process_time_ns() - cpu_start) / 1e6
 
             if profiler: # Only stop profiler if it was started
-                print(f"DEBUG: Pyinstrument profiler STOPPING for request to {request.url.path}.")
-                profiler.stop()
-                try:
-                    profile_json = json.loads(profiler.output("json"))
-                    cpu_time_ms = round(profile_json.get("cpu_time", 0) * 1000, 3)
-                except Exception as e:
-                    print(f"Error processing pyinstrument profile JSON for {request.url.path}: {e}")
-
-            if profile_active: # Only add data to the profiler instance if profiling was active
-                profile_data = {
-                    "Timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
-                    "RequestPath": request.url.path,
-                    "HTTPMethod": request.method,
-                    "StatusCode": response.status_code,
-                    "TotalTimeMs": round(total_time_ms, 3),
-                    "CPUTimeMs": cpu_time_ms
-                }
-                profiler_instance.add_profile_data(profile_data)
-                print(f"DEBUG: Added profile data for {request.url.path} (status: {response.status_code}, total_time: {total_time_ms:.3f}ms).")
-            else:
-                print(f"DEBUG: Profiling NOT active for {request.url.path}. Data not added.")
-
-            return response
+                session = profiler.stop()
+                cpu_time_ms = session.cpu_time * 1000
+
+            profiler_instance.add_profile_data(ProfileRow(
+                _now_ts(), path, method, status_code,
+                round(total_time_ms, 3), round(cpu_time_ms, 3)
+            ))
+            logger.debug("Added profile data for %s (status: %s, total_time: %.3fms).",
+                         path, status_code, total_time_ms)
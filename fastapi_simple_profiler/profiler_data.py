@@ -1,17 +1,35 @@
 # fastapi_simple_profiler/profiler_data.py
-import pandas as pd
-from typing import List, Dict, Any
+import csv
+from collections import deque, namedtuple
+from operator import itemgetter
+from typing import AsyncIterator, Deque, Dict, Tuple
 import io
+import itertools
 import threading
-import time # Import time for timestamp formatting
+
+# A single profiled request. Fields are in CSV column order, so a row can be written
+# as-is without building a dict per request.
+ProfileRow = namedtuple("ProfileRow", [
+    "Timestamp", "RequestPath", "HTTPMethod", "StatusCode",
+    "TotalTimeMs", "CPUTimeMs"
+])
+
+# Number of rows written per chunk by FastAPIProfiler.export_to_csv
+CSV_CHUNK_ROWS = 500
 
 class FastAPIProfiler:
     """
     Manages in-memory storage of profiled request data and handles CSV export.
     Implemented as a singleton to ensure a single source of truth for profiling data.
+
+    Each thread records into its own bounded subqueue, so the hot path never takes
+    a global lock. Readers drain the subqueues into an immutable snapshot tuple,
+    which is returned as-is until new data arrives.
     """
     _instance = None
-    _lock = threading.Lock() # Lock for thread-safe data access
+    # Guards singleton creation, the subqueue registry and the snapshot; never taken
+    # per request once a thread has its subqueue.
+    _lock = threading.Lock()
 
     def __new__(cls):
         """
@@ -23,8 +41,14 @@ class FastAPIProfiler:
                 if cls._instance is None:
                     cls._instance = super(FastAPIProfiler, cls).__new__(cls)
                     # Initialize attributes for the new instance
-                    cls._instance.profiled_requests_data: List[Dict[str, Any]] = []
                     cls._instance.max_retained_requests = 1000 # Default max requests to keep in memory
+                    # Per-thread staging subqueues keyed by thread ident. Entries are
+                    # (sequence, row) pairs so a drained batch can be put back into
+                    # recording order.
+                    cls._instance._subqueues: Dict[int, Deque[Tuple[int, ProfileRow]]] = {}
+                    cls._instance._sequence = itertools.count()
+                    # Drained rows, oldest first. Immutable, so it is handed to readers without copying.
+                    cls._instance._snapshot: Tuple[ProfileRow, ...] = ()
         return cls._instance
 
     def configure(self, max_retained_requests: int = 1000):
@@ -39,43 +63,70 @@ class FastAPIProfiler:
         """
         if max_retained_requests < 1:
             raise ValueError("max_retained_requests must be at least 1.")
-        self.max_retained_requests = max_retained_requests
-        # Prune immediately if the new configuration is smaller than current data size
-        self._prune_old_data()
-
-    def add_profile_data(self, data: Dict[str, Any]):
+        with self._lock:
+            self.max_retained_requests = max_retained_requests
+            # Trim each subqueue in place, keeping only the most recent entries. The deque
+            # objects are never replaced, since writers hold them without the lock.
+            for subqueue in self._subqueues.values():
+                for _ in range(len(subqueue) - max_retained_requests):
+                    try:
+                        subqueue.popleft()
+                    except IndexError:
+                        break # The owning thread evicted concurrently
+            self._snapshot = self._snapshot[-max_retained_requests:]
+
+    def add_profile_data(self, row: ProfileRow):
         """
         Adds a single profiled request's data to the in-memory store.
-        Ensures thread-safe appending and pruning.
+        Lock-free after a thread's first call: deque.append and next() on
+        itertools.count are atomic in CPython. The oldest entry of the subqueue
+        is evicted once max_retained_requests is exceeded.
 
         Args:
-            data (Dict[str, Any]): A dictionary containing profiled metrics for a request.
-                                   Expected keys: Timestamp, RequestPath, HTTPMethod,
-                                   StatusCode, TotalTimeMs, CPUTimeMs.
+            row (ProfileRow): The profiled metrics for a request.
         """
-        with self._lock:
-            self.profiled_requests_data.append(data)
-            self._prune_old_data()
-
-    def _prune_old_data(self):
+        tid = threading.get_ident()
+        subqueue = self._subqueues.get(tid)
+        if subqueue is None:
+            with self._lock:
+                subqueue = self._subqueues.setdefault(tid, deque())
+        subqueue.append((next(self._sequence), row))
+        # Bounded by hand rather than with deque(maxlen=...), so configure() can resize
+        # the subqueue without swapping it out from under this thread.
+        if len(subqueue) > self.max_retained_requests:
+            try:
+                subqueue.popleft()
+            except IndexError:
+                pass # Drained concurrently by get_profile_data
+
+    def get_profile_data(self) -> Tuple[ProfileRow, ...]:
         """
-        Internal method to prune old data to adhere to the max_retained_requests policy.
-        This keeps only the most recent N requests.
-        """
-        if len(self.profiled_requests_data) > self.max_retained_requests:
-            # Efficiently slice the list to keep only the latest N entries
-            self.profiled_requests_data = self.profiled_requests_data[-self.max_retained_requests:]
-
-    def get_profile_data(self) -> List[Dict[str, Any]]:
-        """
-        Retrieves all currently stored profiled request data.
-        Returns a copy to prevent external modification issues.
+        Retrieves all currently stored profiled request data, oldest first.
+        Rows recorded since the last call are drained into the snapshot first; if
+        there are none, the existing snapshot is returned without any copying.
+        The snapshot is an immutable tuple, so it is safe to share with callers.
 
         Returns:
-            List[Dict[str, Any]]: A list of dictionaries, each representing a profiled request.
+            Tuple[ProfileRow, ...]: A tuple of rows, each representing a profiled request.
         """
         with self._lock:
-            return list(self.profiled_requests_data) # Return a copy
+            staged = []
+            for subqueue in self._subqueues.values():
+                # popleft is atomic, so rows appended concurrently are either drained
+                # now or left for the next read, never lost.
+                for _ in range(len(subqueue)):
+                    try:
+                        staged.append(subqueue.popleft())
+                    except IndexError:
+                        break # The owning thread evicted concurrently
+            if staged:
+                staged.sort(key=itemgetter(0))
+                snapshot = self._snapshot + tuple(row for _, row in staged)
+                # Every subqueue is bounded on its own, so trim the merged view to the global limit
+                if len(snapshot) > self.max_retained_requests:
+                    snapshot = snapshot[-self.max_retained_requests:]
+                self._snapshot = snapshot
+            return self._snapshot
 
     def clear_data(self):
         """
@@ -83,44 +134,32 @@ class FastAPIProfiler:
         Ensures thread-safe clearing.
         """
         with self._lock:
-            self.profiled_requests_data = []
+            for subqueue in self._subqueues.values():
+                subqueue.clear()
+            self._snapshot = ()
 
-    def export_to_csv(self) -> io.StringIO:
+    async def export_to_csv(self) -> AsyncIterator[str]:
         """
-        Exports the stored profiling data to a CSV formatted StringIO object.
-        This StringIO object can be used directly with FastAPI's StreamingResponse.
+        Exports the stored profiling data as CSV, yielding it in chunks of
+        CSV_CHUNK_ROWS rows. The generator can be passed directly to FastAPI's
+        StreamingResponse, so the full CSV text is never held in memory at once.
 
-        Returns:
-            io.StringIO: A StringIO object containing the CSV data.
+        Yields:
+            str: The header row followed by consecutive chunks of CSV data.
         """
         data_to_export = self.get_profile_data()
 
-        # Define the desired order and default columns for the CSV
-        desired_columns = [
-            "Timestamp", "RequestPath", "HTTPMethod", "StatusCode",
-            "TotalTimeMs", "CPUTimeMs"
-        ]
-
-        if not data_to_export:
-            # If no data, create an empty DataFrame with the desired headers
-            df = pd.DataFrame(columns=desired_columns)
-        else:
-            df = pd.DataFrame(data_to_export)
-
-            # Ensure all desired columns are present, filling missing with NaN if necessary
-            # and reorder columns as per desired_columns list
-            for col in desired_columns:
-                if col not in df.columns:
-                    df[col] = pd.NA # Use pandas Not Available for missing data
-
-            # Reorder columns to the desired sequence
-            df = df[desired_columns]
-
+        # Small scratch buffer, emptied after every chunk
         csv_buffer = io.StringIO()
-        # Export DataFrame to CSV string. index=False prevents writing the DataFrame index.
-        df.to_csv(csv_buffer, index=False)
-        csv_buffer.seek(0) # Rewind the buffer to the beginning for reading
-        return csv_buffer
+        writer = csv.writer(csv_buffer, lineterminator="\n")
+        writer.writerow(ProfileRow._fields)
+        for start in range(0, len(data_to_export), CSV_CHUNK_ROWS):
+            writer.writerows(data_to_export[start:start + CSV_CHUNK_ROWS])
+            yield csv_buffer.getvalue()
+            csv_buffer.seek(0)
+            csv_buffer.truncate()
+        if not data_to_export:
+            yield csv_buffer.getvalue() # Header only
 
 # Create a global instance of the profiler here, where its class is defined.
 # This ensures it exists before any module tries to import it.
@@ -3,16 +3,32 @@
 # the fastapi-simple-profiler middleware.
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, StreamingResponse
+import numpy as np # Used for the vectorized CPU-bound demo work
 import uvicorn
 import time
 import asyncio
-import io # Import io for handling CSV buffer
-import pandas as pd # Import pandas to help with HTML table generation
+import html # Import html to escape request data in the dashboard table
 
 # Import the ProfilerMiddleware and the global profiler_instance from your package
 from fastapi_simple_profiler import ProfilerMiddleware, profiler_instance
 
+def sum_of_squares(n: int) -> int:
+    """
+    Returns sum(x * x for x in range(n)), computed in NumPy's vectorized C loop.
+    Exact only for n below ~3,000,000; larger values overflow the int64 accumulator.
+    """
+    return int(np.square(np.arange(n, dtype=np.int64)).sum())
+
+def burn_cpu(repeats: int, size: int = 10_000) -> None:
+    """
+    Repeats a small vectorized sum of squares to consume measurable CPU time.
+    Each repeat only touches a size-element array, so memory use stays small.
+    """
+    for _ in range(repeats):
+        sum_of_squares(size)
+
 # Initialize the FastAPI application
 app = FastAPI(
     title="FastAPI Simple Profiler Demo",
@@ -55,30 +71,27 @@ async def read_item(item_id: int):
     """
     An endpoint that simulates different types of work based on item_id:
     - Even IDs: Simulate longer asynchronous I/O.
-    - Odd IDs: Simulate CPU-bound work (blocking operation).
+    - Odd IDs: Simulate CPU-bound work.
     """
     if item_id % 2 == 0:
         await asyncio.sleep(0.05) # Simulate longer async work for even IDs
     else:
-        # Significantly increase CPU-bound work here
-        # This loop will consume noticeable CPU time
-        result = 0
-        for _ in range(5_000_000): # Increased from 1,000,000 to 5,000,000 for more CPU time
-            result += sum(x * x for x in range(20)) # More complex calculation per iteration
-        # No time.sleep here, so it's purely CPU-bound within Python
+        # Vectorized CPU-bound work, run in the threadpool so it does not block the event loop.
+        # It still consumes noticeable CPU time, which shows up in CPUTimeMs.
+        await run_in_threadpool(burn_cpu, 5_000)
     return {"item_id": item_id, "message": "Item processed"}
 
 @app.get("/cpu-intensive", summary="Dedicated CPU-Intensive Endpoint", response_model=dict)
 async def cpu_intensive_endpoint():
     """
     A dedicated endpoint to demonstrate high CPUTimeMs by performing
-    a significant amount of synchronous, CPU-bound calculation.
+    a significant amount of CPU-bound calculation.
     """
     print("INFO: /cpu-intensive endpoint activated - performing heavy computation.")
-    result = 0
-    # Perform a very heavy synchronous CPU-bound task
-    for _ in range(20_000_000): # Even larger loop: Increased from 5,000,000 to 20,000,000
-        result += sum(x * x for x in range(50)) # More complex calculation
+    # The old loop added the same inner sum 20,000,000 times, so it reduces to one multiplication
+    result = sum_of_squares(50) * 20_000_000
+    # Perform a heavy vectorized CPU-bound task in the threadpool so the event loop stays responsive
+    await run_in_threadpool(burn_cpu, 20_000)
     print("INFO: /cpu-intensive endpoint computation finished.")
     return {"message": "CPU intensive task completed", "result_dummy": result % 100}
 
@@ -133,24 +146,23 @@ async def get_profiler_dashboard():
         </html>
         """
     else:
-        # Create a DataFrame from the profile data
-        df = pd.DataFrame(profile_data)
-
-        # Define the desired column order for display
-        desired_columns = [
-            "Timestamp", "RequestPath", "HTTPMethod", "StatusCode",
-            "TotalTimeMs", "CPUTimeMs"
-        ]
-        # Ensure all desired columns are present, filling missing with NaN if necessary
-        for col in desired_columns:
-            if col not in df.columns:
-                df[col] = pd.NA
-
-        # Reorder columns to the desired sequence
-        df = df[desired_columns]
-
-        # Convert DataFrame to an HTML table string
-        html_table = df.to_html(index=False, classes="min-w-full divide-y divide-gray-200 shadow-sm sm:rounded-lg")
+        # Build the table rows directly; the path and method come from the client,
+        # so they are escaped before being placed in the page.
+        rows = "".join(
+            f"<tr><td>{row.Timestamp}</td>"
+            f"<td>{html.escape(row.RequestPath)}</td>"
+            f"<td>{html.escape(row.HTTPMethod)}</td>"
+            f"<td>{row.StatusCode}</td>"
+            f"<td>{row.TotalTimeMs}</td>"
+            f"<td>{row.CPUTimeMs}</td></tr>"
+            for row in profile_data
+        )
+        html_table = (
+            '<table class="min-w-full divide-y divide-gray-200 shadow-sm sm:rounded-lg">'
+            "<thead><tr><th>Timestamp</th><th>RequestPath</th><th>HTTPMethod</th>"
+            "<th>StatusCode</th><th>TotalTimeMs</th><th>CPUTimeMs</th></tr></thead>"
+            f"<tbody>{rows}</tbody></table>"
+        )
 
         # Basic HTML structure with Tailwind CSS for modern look
         html_content = f"""
@@ -199,9 +211,8 @@ async def get_profiler_metrics_csv():
     Dedicated endpoint to download the collected profiling metrics as a CSV file.
     This still exists for users who prefer direct download.
     """
-    csv_buffer = profiler_instance.export_to_csv()
     return StreamingResponse(
-        csv_buffer,
+        profiler_instance.export_to_csv(),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=fastapi_profile_metrics.csv"}
     )
@@ -35,9 +35,15 @@ setup(
     install_requires=[
         "fastapi>=0.68.0", # Dependency for FastAPI applications
         "starlette>=0.14.2", # FastAPI is built on Starlette
-        "pyinstrument>=4.0.0", # Essential for detailed CPU time profiling
-        "pandas>=1.0.0", # Used for efficient CSV generation
     ],
+    extras_require={
+        "detailed": [
+            "pyinstrument>=4.0.0", # Optional stack-sampling CPU profiler (detailed_cpu_profiling=True)
+        ],
+        "analysis": [
+            "pandas>=1.0.0", # Optional, for analysing exported metrics; not used by the package itself
+        ],
+    },
     keywords="fastapi profiler performance metrics csv google-sheets monitoring profiling",
     project_urls={
         "Bug Tracker": "https://github.com/jithinsankar/fastapi-simple-profiler/issues", # Replace with your issues URL
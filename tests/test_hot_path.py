@@ -0,0 +1,30 @@
+# tests/test_hot_path.py
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter so modules imported by other tests (or pytest plugins)
+# cannot mask an import made by the package itself. json is not checked, since
+# starlette imports it on its own.
+GUARD_SCRIPT = """
+import sys
+from fastapi_simple_profiler import ProfileRow, profiler_instance
+
+profiler_instance.add_profile_data(
+    ProfileRow("2024-01-01 00:00:00", "/", "GET", 200, 1.0, 1.0)
+)
+print(",".join(name for name in ("pandas", "pyinstrument") if name in sys.modules))
+"""
+
+
+def test_add_profile_data_does_not_import_heavy_modules():
+    result = subprocess.run(
+        [sys.executable, "-c", GUARD_SCRIPT],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == ""